@@ -1,22 +1,17 @@
 import argparse
-import json
+import asyncio
 import logging
+import mmap
 import os
+import random
 import sys
-import time
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Union
-
-import praw
-import prawcore
-from praw.models import Comment, Submission
-from tenacity import (
-    before_sleep_log,
-    retry,
-    retry_if_exception_type,
-    stop_after_attempt,
-    wait_exponential,
-)
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import asyncpraw
+import asyncprawcore
+import orjson
+from asyncpraw.models import Comment, Submission, Subreddit
 
 logging.basicConfig(
     level=logging.INFO,
@@ -29,109 +24,233 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Backoff for rate-limited or failed listing requests, in seconds
+MAX_RETRY_ATTEMPTS = 20
+RETRY_MIN_WAIT = 60
+RETRY_MAX_WAIT = 180
+
+# Plain JSON fields copied as-is from a submission; author and subreddit are
+# PRAW objects and are reduced to their names separately.
+SUBMISSION_FIELDS = (
+    "id",
+    "name",
+    "title",
+    "selftext",
+    "url",
+    "permalink",
+    "domain",
+    "created_utc",
+    "edited",
+    "score",
+    "ups",
+    "upvote_ratio",
+    "num_comments",
+    "num_crossposts",
+    "over_18",
+    "spoiler",
+    "stickied",
+    "locked",
+    "is_self",
+    "is_video",
+    "media_only",
+    "media",
+    "secure_media",
+    "link_flair_text",
+    "distinguished",
+    "gilded",
+    "total_awards_received",
+    "subreddit_id",
+    "subreddit_name_prefixed",
+    "author_fullname",
+)
+
+
+def read_json(path: str) -> Any:
+    """Parse a JSON file straight from a memory map, without copying it into a bytes object."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return orjson.loads(f.read())  # Empty files can't be mapped
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+
 
 @dataclass
 class RedditDataRetriever:
     data_dir: str
-    reddit: praw.Reddit = field(init=False)
+    max_concurrency: int = 10
+    stream_comments: bool = True
+    checkpoint_every: int = 10
+    pretty: bool = False
+    reddit: Optional[asyncpraw.Reddit] = field(default=None, init=False)
     threads_dir: str = field(init=False)
     comments_dir: str = field(init=False)
+    checkpoint_path: str = field(init=False)
+    _checkpoints: Dict[str, Dict[str, Union[int, Optional[str]]]] = field(
+        init=False, repr=False
+    )
+    _subreddit_cache: Dict[str, Subreddit] = field(
+        default_factory=dict, init=False, repr=False
+    )
+    _threads_dir_fd: int = field(init=False, repr=False)
+    _comments_dir_fd: int = field(init=False, repr=False)
 
     def __post_init__(self):
-        self.reddit = praw.Reddit("bot1", config_interpolation="basic")
         self.threads_dir = os.path.join(self.data_dir, "threads")
         self.comments_dir = os.path.join(self.data_dir, "comments")
+        self.checkpoint_path = os.path.join(self.data_dir, "checkpoint.json")
         os.makedirs(self.threads_dir, exist_ok=True)
         os.makedirs(self.comments_dir, exist_ok=True)
+        # Output files are opened relative to these descriptors (POSIX only), which
+        # avoids re-resolving the full directory path on every save.
+        self._threads_dir_fd = os.open(self.threads_dir, os.O_RDONLY | os.O_DIRECTORY)
+        self._comments_dir_fd = os.open(self.comments_dir, os.O_RDONLY | os.O_DIRECTORY)
+        self._checkpoints = self._read_checkpoints()
 
-    @retry(
-        stop=stop_after_attempt(20),
-        wait=wait_exponential(multiplier=1, min=60, max=180),
-        retry=retry_if_exception_type(
-            (prawcore.exceptions.TooManyRequests, prawcore.exceptions.RequestException)
-        ),
-        reraise=True,  # Reraise the exception after all retries have failed
-        before_sleep=before_sleep_log(logger, logging.INFO),  # Logging before sleep
-    )
-    def _get_submissions(
+    def _get_reddit(self) -> asyncpraw.Reddit:
+        """Creates the client on first use, since asyncpraw must be created inside the event loop."""
+        if self.reddit is None:
+            # asyncpraw paces requests from Reddit's X-Ratelimit headers and sleeps on
+            # rate-limit errors shorter than ratelimit_seconds, so no fixed delays needed.
+            self.reddit = asyncpraw.Reddit(
+                "bot1", config_interpolation="basic", ratelimit_seconds=600
+            )
+        return self.reddit
+
+    async def _get_subreddit(self, subreddit_name: str) -> Subreddit:
+        """Returns the Subreddit object for a name, creating it only once per retriever."""
+        if subreddit_name not in self._subreddit_cache:
+            self._subreddit_cache[subreddit_name] = await self._get_reddit().subreddit(
+                subreddit_name
+            )
+        return self._subreddit_cache[subreddit_name]
+
+    async def _get_submissions(
         self,
         subreddit_name: str,
         sort: str = "top",
         time_filter: str = "all",
         limit: int = 1000,
-    ) -> List[praw.models.Submission]:
+        after: Optional[str] = None,
+    ) -> List[Submission]:
         """
-        API call to get submissions wrapped with tenacity for retries.
+        API call to get submissions, retried with exponential backoff and jitter.
         Allows sorting by 'top', 'hot', 'new', etc. and time filtering for 'top' and 'controversial'.
+        If after is a submission fullname, only the submissions listed after it are returned.
         """
-        subreddit = self.reddit.subreddit(subreddit_name)
-        if sort in ["top", "controversial"]:
-            return list(getattr(subreddit, sort)(time_filter=time_filter, limit=limit))
-        else:
-            return list(getattr(subreddit, sort)(limit=limit))
+        subreddit = await self._get_subreddit(subreddit_name)
+        # top() and controversial() update the params dict, so it can't be None
+        params = {"after": after} if after else {}
+        for attempt in range(1, MAX_RETRY_ATTEMPTS + 1):
+            try:
+                if sort in ["top", "controversial"]:
+                    listing = getattr(subreddit, sort)(
+                        time_filter=time_filter, limit=limit, params=params
+                    )
+                else:
+                    listing = getattr(subreddit, sort)(limit=limit, params=params)
+                return [submission async for submission in listing]
+            except (
+                asyncprawcore.exceptions.TooManyRequests,
+                asyncprawcore.exceptions.RequestException,
+            ) as e:
+                if attempt == MAX_RETRY_ATTEMPTS:
+                    raise  # Reraise the exception after all retries have failed
+                delay = min(
+                    RETRY_MAX_WAIT,
+                    RETRY_MIN_WAIT * 2 ** (attempt - 1) * (1 + random.random() * 0.5),
+                )
+                logger.info(
+                    "Retrying _get_submissions in %.1f seconds as it raised %r.",
+                    delay,
+                    e,
+                )
+                await asyncio.sleep(delay)
 
     @staticmethod
-    def _serialize_praw_object(obj: Any) -> Any:
+    def _json_default(obj: Any) -> Any:
+        """Fallback for values orjson can't serialize natively, e.g. PRAW objects."""
         if hasattr(obj, "json_dict"):
             return obj.json_dict()
-        elif hasattr(obj, "__dict__"):
-            data = obj.__dict__
-            return {
-                key: RedditDataRetriever._serialize_praw_object(value)
-                for key, value in data.items()
-                if not key.startswith("_")
-            }
-        else:
-            return str(obj)
+        return str(obj)
 
     def _process_comment(
         self,
         comment: Comment,
     ) -> Dict[str, Union[str, int, float, List[Any], None]]:
-        """Process a single comment to extract relevant information."""
+        """Process a single comment to extract relevant information, without its replies."""
+        # Reading the instance dict directly skips PRAW's lazy __getattr__, which
+        # would otherwise fetch the full comment when an attribute is missing.
+        d = vars(comment)
+        author = d.get("author")
         return {
-            "id": comment.id,
-            "body": comment.body,
-            "author": str(comment.author) if comment.author else None,
-            "created_utc": comment.created_utc,
-            "score": comment.score,
-            "is_submitter": comment.is_submitter,
-            "parent_id": comment.parent_id,
-            "link_id": comment.link_id,
-            "permalink": comment.permalink,
-            "controversiality": comment.controversiality,
-            "gilded": comment.gilded,
-            "likes": comment.likes,
-            "num_reports": comment.num_reports
-            if hasattr(comment, "num_reports")
-            else None,  # num_reports might not be available
-            "replies": [self._process_comment(reply) for reply in comment.replies]
-            if comment.replies
-            else [],
-            "saved": comment.saved,
-            "score_hidden": comment.score_hidden,
-            "stickied": comment.stickied,
-            "subreddit_id": comment.subreddit_id,
-            "total_awards_received": comment.total_awards_received,
-            "upvote_ratio": getattr(
-                comment, "upvote_ratio", None
-            ),  # upvote_ratio may not always be present
-            "depth": comment.depth,
+            "id": d.get("id"),
+            "body": d.get("body"),
+            "author": str(author) if author else None,
+            "created_utc": d.get("created_utc"),
+            "score": d.get("score"),
+            "is_submitter": d.get("is_submitter"),
+            "parent_id": d.get("parent_id"),
+            "link_id": d.get("link_id"),
+            "permalink": d.get("permalink"),
+            "controversiality": d.get("controversiality"),
+            "gilded": d.get("gilded"),
+            "likes": d.get("likes"),
+            "num_reports": d.get("num_reports"),  # num_reports might not be available
+            "saved": d.get("saved"),
+            "score_hidden": d.get("score_hidden"),
+            "stickied": d.get("stickied"),
+            "subreddit_id": d.get("subreddit_id"),
+            "total_awards_received": d.get("total_awards_received"),
+            "upvote_ratio": d.get("upvote_ratio"),  # upvote_ratio may not be present
+            "depth": d.get("depth"),
         }
 
-    def _extract_comments(self, submission: Submission) -> List[Dict[str, Any]]:
-        """Extract comments from a submission."""
-        submission.comments.replace_more(limit=0)  # Ensures no "MoreComments" objects
-        return [
-            self._process_comment(comment) for comment in submission.comments.list()
-        ]
+    async def _list_comments(self, submission: Submission) -> List[Comment]:
+        """Fetch all comments of a submission as a flat, breadth-first list."""
+        await submission.load()  # Listing results don't include the comment tree
+        await submission.comments.replace_more(limit=0)  # Ensures no "MoreComments"
+        return submission.comments.list()
+
+    def _extract_comments(self, comments: List[Comment]) -> List[Dict[str, Any]]:
+        """Extract comments from the flat list returned by _list_comments."""
+        # The list is breadth-first, so every parent is processed before its replies
+        # and the tree can be linked up in a single pass without recursion.
+        processed = {}
+        for comment in comments:
+            comment_data = self._process_comment(comment)
+            comment_data["replies"] = []
+            parent_data = processed.get(comment.parent_id)
+            if parent_data is not None:
+                parent_data["replies"].append(comment_data)
+            processed[comment.fullname] = comment_data
+        return list(processed.values())
+
+    def _stream_comments(self, comments: List[Comment], filename: str) -> None:
+        """Write comments to an NDJSON file one line at a time as they are processed.
+
+        Each line is a flat comment; the tree can be rebuilt from parent_id.
+        """
+        with open(self._open_output(filename, is_comment=True), "wb") as f:
+            for comment in comments:
+                f.write(
+                    orjson.dumps(
+                        self._process_comment(comment),
+                        default=self._json_default,
+                        option=orjson.OPT_NAIVE_UTC,
+                    )
+                )
+                f.write(b"\n")
 
     def _serialize_submission(self, submission: Submission) -> Dict[str, Any]:
-        submission_dict = vars(submission)
-        serialized_data = {
-            key: self._serialize_praw_object(value)
-            for key, value in submission_dict.items()
-            if not key.startswith("_")
+        """Serialize the whitelisted submission fields without walking PRAW objects."""
+        d = vars(submission)
+        serialized_data = {key: d.get(key) for key in SUBMISSION_FIELDS}
+        author = d.get("author")
+        serialized_data["author"] = {"name": str(author)} if author else None
+        serialized_data["subreddit"] = {
+            "id": d.get("subreddit_id"),
+            "display_name": str(d.get("subreddit")),
         }
         return serialized_data
 
@@ -139,80 +258,198 @@ class RedditDataRetriever:
         self, data: Dict[str, Any], filename: str, is_comment: bool = False
     ) -> None:
         """Save data to a JSON file in the specified directory."""
-        directory = self.comments_dir if is_comment else self.threads_dir
-        file_path = os.path.join(directory, filename)
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC
+        if self.pretty:
+            option |= orjson.OPT_INDENT_2
+        payload = memoryview(
+            orjson.dumps(data, default=self._json_default, option=option)
+        )
+        fd = self._open_output(filename, is_comment)
+        try:
+            while payload:
+                payload = payload[os.write(fd, payload) :]
+        finally:
+            os.close(fd)
 
-    def _save_checkpoint(
-        self, index: int, subreddit_name: str, sort: str, time_filter: str
-    ) -> None:
-        """Saves the last processed index to a single file with sort type and time filter as keys."""
-        checkpoint_filename = "checkpoint.json"
-        checkpoint_key = f"{subreddit_name}_{sort}_{time_filter}"
+    def _open_output(self, filename: str, is_comment: bool = False) -> int:
+        """Open an output file for writing relative to the cached directory descriptor."""
+        dir_fd = self._comments_dir_fd if is_comment else self._threads_dir_fd
+        return os.open(
+            filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644, dir_fd=dir_fd
+        )
+
+    async def close(self) -> None:
+        """Close the Reddit session and release the cached output directory descriptors."""
+        if self.reddit is not None:
+            await self.reddit.close()
+        os.close(self._threads_dir_fd)
+        os.close(self._comments_dir_fd)
 
+    def _read_checkpoints(self) -> Dict[str, Dict[str, int]]:
+        """Reads the checkpoint file once so later lookups are served from memory."""
         try:
-            with open(os.path.join(self.data_dir, checkpoint_filename), "r") as f:
-                checkpoints = json.load(f)
+            return read_json(self.checkpoint_path)
         except FileNotFoundError:
-            checkpoints = {}
+            return {}  # If the file doesn't exist, start from the beginning
+
+    def _save_checkpoint(
+        self,
+        index: int,
+        subreddit_name: str,
+        sort: str,
+        time_filter: str,
+        fullname: Optional[str] = None,
+        flush: bool = True,
+    ) -> None:
+        """Records the last processed index and submission fullname with sort type and time filter as keys.
 
-        checkpoints[checkpoint_key] = {"last_processed_index": index}
+        The checkpoint file is only rewritten when flush is set.
+        """
+        checkpoint_key = f"{subreddit_name}_{sort}_{time_filter}"
+        self._checkpoints[checkpoint_key] = {
+            "last_processed_index": index,
+            "last_fullname": fullname,
+        }
+        if flush:
+            self._flush_checkpoints()
 
-        with open(os.path.join(self.data_dir, checkpoint_filename), "w") as f:
-            json.dump(checkpoints, f)
+    def _flush_checkpoints(self) -> None:
+        """Writes all in-memory checkpoints to a single file."""
+        with open(self.checkpoint_path, "wb") as f:
+            f.write(orjson.dumps(self._checkpoints))
 
-    def _load_checkpoint(self, subreddit_name: str, sort: str, time_filter: str) -> int:
-        """Loads the last processed index from a single file using a specific key with time filter."""
-        checkpoint_filename = "checkpoint.json"
+    def _load_checkpoint(
+        self, subreddit_name: str, sort: str, time_filter: str
+    ) -> Tuple[int, Optional[str]]:
+        """Loads the last processed index and submission fullname for a specific key with time filter."""
         checkpoint_key = f"{subreddit_name}_{sort}_{time_filter}"
+        checkpoint = self._checkpoints.get(checkpoint_key, {})
+        return checkpoint.get("last_processed_index", 0), checkpoint.get(
+            "last_fullname"
+        )
 
-        try:
-            with open(os.path.join(self.data_dir, checkpoint_filename), "r") as f:
-                checkpoints = json.load(f)
-            return checkpoints.get(checkpoint_key, {}).get("last_processed_index", 0)
-        except FileNotFoundError:
-            return 0  # If the file doesn't exist, start from the beginning
+    async def _process_submission(
+        self,
+        index: int,
+        submission: Submission,
+        subreddit_name: str,
+        semaphore: asyncio.Semaphore,
+    ) -> int:
+        """Saves a single submission and its comments, returning its index when done."""
+        async with semaphore:
+            # File writes run in a worker thread so they don't stall other requests
+            submission_data = self._serialize_submission(submission)
+            submission_filename = f"{subreddit_name}_{submission.id}.json"
+            await asyncio.to_thread(
+                self._save_data, submission_data, submission_filename
+            )
 
-    def retrieve_threads(
+            comments = await self._list_comments(submission)
+            if self.stream_comments:
+                comments_filename = f"{subreddit_name}_{submission.id}_comments.ndjson"
+                await asyncio.to_thread(
+                    self._stream_comments, comments, comments_filename
+                )
+            else:
+                comments_data = await asyncio.to_thread(
+                    self._extract_comments, comments
+                )
+                comments_filename = f"{subreddit_name}_{submission.id}_comments.json"
+                await asyncio.to_thread(
+                    self._save_data, comments_data, comments_filename, True
+                )
+        return index
+
+    async def retrieve_threads(
         self,
         subreddit_name: str,
         sort: str = "top",
         time_filter: str = "all",
-        limit: int = "1000",
+        limit: int = 1000,
         log_progress: bool = True,
     ) -> None:
         """High-level method to retrieve top threads and handle API interaction."""
-        last_processed_index = self._load_checkpoint(subreddit_name, sort, time_filter)
+        last_processed_index, last_fullname = self._load_checkpoint(
+            subreddit_name, sort, time_filter
+        )
         try:
-            top_submissions = self._get_submissions(
-                subreddit_name=subreddit_name,
-                limit=limit,
-                sort=sort,
-                time_filter=time_filter,
-            )
-            print(limit, last_processed_index, len(top_submissions))
-            for i, submission in enumerate(
-                top_submissions[last_processed_index:], start=last_processed_index
-            ):
-                if log_progress:
-                    logger.info(
-                        f"Processing thread {i + 1} of {limit} from r/{subreddit_name} from {sort} of {time_filter}..."
+            if last_fullname:
+                # Resume right after the last saved submission instead of listing
+                # (and paging through) everything that was already processed.
+                start_index = last_processed_index + 1
+                top_submissions = await self._get_submissions(
+                    subreddit_name=subreddit_name,
+                    limit=max(limit - start_index, 0),
+                    sort=sort,
+                    time_filter=time_filter,
+                    after=last_fullname,
+                )
+            else:
+                # Older checkpoints only know the index
+                start_index = last_processed_index
+                top_submissions = (
+                    await self._get_submissions(
+                        subreddit_name=subreddit_name,
+                        limit=limit,
+                        sort=sort,
+                        time_filter=time_filter,
                     )
-
-                submission_data = self._serialize_submission(submission)
-                submission_filename = f"{subreddit_name}_{submission.id}.json"
-                self._save_data(submission_data, submission_filename)
-                time.sleep(1)
-
-                comments_data = self._extract_comments(submission)
-                comments_filename = f"{subreddit_name}_{submission.id}_comments.json"
-                self._save_data(comments_data, comments_filename, is_comment=True)
-                self._save_checkpoint(i, subreddit_name, sort, time_filter)
-                time.sleep(1)
+                )[start_index:]
+            print(limit, last_processed_index, len(top_submissions))
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            tasks = [
+                asyncio.create_task(
+                    self._process_submission(i, submission, subreddit_name, semaphore)
+                )
+                for i, submission in enumerate(top_submissions, start=start_index)
+            ]
+            # Only checkpoint the highest index below which every thread is done,
+            # so a resumed run never skips a submission that was still in flight.
+            finished = set()
+            next_index = start_index
+            # next_index can jump past a multiple of checkpoint_every when several
+            # threads finish together, so flush by distance from the last flush
+            last_flushed = start_index - 1
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    i = await next_done
+                    if log_progress:
+                        logger.info(
+                            "Processed thread %d of %s from r/%s from %s of %s...",
+                            i + 1,
+                            limit,
+                            subreddit_name,
+                            sort,
+                            time_filter,
+                        )
+                    finished.add(i)
+                    if next_index in finished:
+                        while next_index in finished:
+                            finished.remove(next_index)
+                            next_index += 1
+                        flush = next_index - 1 - last_flushed >= self.checkpoint_every
+                        if flush:
+                            last_flushed = next_index - 1
+                        self._save_checkpoint(
+                            next_index - 1,
+                            subreddit_name,
+                            sort,
+                            time_filter,
+                            fullname=top_submissions[
+                                next_index - 1 - start_index
+                            ].fullname,
+                            flush=flush,
+                        )
+            except Exception:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
 
         except Exception as e:
             logger.error(f"An error occurred while retrieving top threads: {e}")
+        finally:
+            self._flush_checkpoints()
 
 
 if __name__ == "__main__":
@@ -225,13 +462,32 @@ if __name__ == "__main__":
         default="all",
         help="Time filter for sorting, if applicable (day, week, month, year, all)",
     )
+    parser.add_argument(
+        "--legacy_json",
+        action="store_true",
+        help="Save comments as a single nested JSON file instead of NDJSON",
+    )
+
+    parser.add_argument(
+        "--pretty",
+        action="store_true",
+        help="Indent the saved JSON files, e.g. for debugging",
+    )
 
     args = parser.parse_args()
 
-    retriever = RedditDataRetriever("../data")
-    retriever.retrieve_threads(
-        subreddit_name=args.subreddit,
-        sort=args.sort,
-        time_filter=args.time_filter,
-        limit=args.n_threads,
-    )
+    async def main() -> None:
+        retriever = RedditDataRetriever(
+            "../data", stream_comments=not args.legacy_json, pretty=args.pretty
+        )
+        try:
+            await retriever.retrieve_threads(
+                subreddit_name=args.subreddit,
+                sort=args.sort,
+                time_filter=args.time_filter,
+                limit=args.n_threads,
+            )
+        finally:
+            await retriever.close()
+
+    asyncio.run(main())
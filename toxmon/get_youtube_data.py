@@ -1,14 +1,122 @@
+import atexit
+import hashlib
 import json
 import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime
+from functools import lru_cache, partial
 from pathlib import Path
 from re import sub
-from typing import Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
+import diskcache
 import googleapiclient.discovery
+import httplib2
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 RAW_DATA_PATH = "raw_jsons"
+# Maximum number of IDs videos().list accepts in one call
+VIDEOS_PER_REQUEST = 50
+COMMENT_COLUMNS = [
+    "id",
+    "text",
+    "author_name",
+    "author_id",
+    "like_count",
+    "published_at",
+    "updated_at",
+    "reply_count",
+    "video_id",
+    "channel_id",
+]
+COMMENT_DTYPES = {"like_count": "Int64", "reply_count": "Int64"}
+COMMENT_SCHEMA = pa.schema(
+    [
+        ("id", pa.string()),
+        ("text", pa.string()),
+        ("author_name", pa.string()),
+        ("author_id", pa.string()),
+        ("like_count", pa.int64()),
+        ("published_at", pa.string()),
+        ("updated_at", pa.string()),
+        ("reply_count", pa.int64()),
+        ("video_id", pa.string()),
+        ("channel_id", pa.string()),
+    ]
+)
+CHANNEL_SCHEMA = pa.schema(
+    [
+        ("id", pa.string()),
+        ("title", pa.string()),
+        ("description", pa.string()),
+        ("country", pa.string()),
+        ("published_at", pa.string()),
+        ("view_count", pa.string()),
+        ("sub_count", pa.string()),
+        ("video_count", pa.string()),
+        ("topic_categories", pa.list_(pa.string())),
+        ("made_for_kids", pa.bool_()),
+        ("keywords", pa.string()),
+    ]
+)
+VIDEO_SCHEMA = pa.schema(
+    [
+        ("video_id", pa.string()),
+        ("title", pa.string()),
+        ("description", pa.string()),
+        ("tags", pa.list_(pa.string())),
+        ("category_id", pa.string()),
+        ("published_at", pa.string()),
+        ("duration", pa.string()),
+        ("made_for_kids", pa.bool_()),
+        ("channel", pa.string()),
+        ("view_count", pa.string()),
+        ("like_count", pa.string()),
+        ("favourite_count", pa.string()),
+        ("comment_count", pa.string()),
+        ("topic_categories", pa.list_(pa.string())),
+    ]
+)
+# Rows buffered before a row group is written when streaming comments to parquet
+PARQUET_ROW_GROUP_SIZE = 50_000
+# Parts requested by default, i.e. everything filter_channel_info and
+# filter_video_info read. Callers that need fewer fields can pass a subset to save
+# payload size; a missing part just leaves its fields empty.
+CHANNEL_PARTS = (
+    "brandingSettings",
+    "contentDetails",
+    "snippet",
+    "statistics",
+    "status",
+    "topicDetails",
+)
+VIDEO_PARTS = ("contentDetails", "snippet", "statistics", "status", "topicDetails")
+CACHE_PATH = "cache/youtube"
+# How long cached API responses stay valid, in seconds. Set to 0 to disable caching.
+CACHE_TTL = 24 * 60 * 60
+# Socket timeout for API connections, in seconds
+HTTP_TIMEOUT = 30
+
+# httplib2 connections are not thread-safe, so each worker thread gets its own
+_thread_local = threading.local()
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _new_http():
+    """
+    Creates a keep-alive HTTP connection for API calls.
+    """
+    http = httplib2.Http(timeout=HTTP_TIMEOUT)
+    # Surface network errors as HTTP error responses instead of raw socket errors
+    http.force_exception_to_status_code = True
+    return http
 
 
 def init_service():
@@ -20,23 +128,169 @@ def init_service():
     API_KEY = open(".API_KEY").read().strip()
     print(API_KEY)
     return googleapiclient.discovery.build(
-        api_service_name, api_version, developerKey=API_KEY
+        api_service_name, api_version, developerKey=API_KEY, http=_new_http()
     )
 
 
-def get_channel_info(api_service, channel_id, dump_file=False):
-    channel_info = (
-        api_service.channels()
-        .list(
-            id=channel_id,
-            part="brandingSettings,contentDetails,snippet,statistics,status,topicDetails",
-        )
-        .execute()
+def _execute(request):
+    """
+    Executes an API request over the calling thread's own HTTP connection.
+
+    Args:
+        request: A googleapiclient HttpRequest.
+
+    Returns:
+        The parsed JSON response.
+    """
+    http = getattr(_thread_local, "http", None)
+    if http is None:
+        http = _thread_local.http = _new_http()
+    return request.execute(http=http)
+
+
+def _get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = diskcache.Cache(CACHE_PATH)
+    return _cache
+
+
+def _cached_execute(request, endpoint, resource_id, part):
+    """
+    Executes an API request, reusing a response cached on disk for up to CACHE_TTL seconds.
+
+    Args:
+        request: A googleapiclient HttpRequest.
+        endpoint: The API resource being listed, e.g. "videos".
+        resource_id: The ID(s) the request is for, including any page token.
+        part: The parts requested.
+
+    Returns:
+        The parsed JSON response.
+    """
+    if not CACHE_TTL:
+        return _execute(request)
+    key = hashlib.blake2b(f"{endpoint}|{resource_id}|{part}".encode()).hexdigest()
+    cache = _get_cache()
+    response = cache.get(key)
+    if response is None:
+        response = _execute(request)
+        cache.set(key, response, expire=CACHE_TTL)
+    return response
+
+
+def _chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+@lru_cache(maxsize=None)
+def _ensure_dir(path):
+    # Only the first call per directory touches the filesystem
+    Path(path).mkdir(parents=True, exist_ok=True)
+
+
+@dataclass
+class DumpWriter:
+    """
+    Appends raw API responses to one NDJSON file per channel and resource.
+
+    Writes are queued and drained by a background thread, so the next page request
+    doesn't have to wait for the previous one to hit the disk. Responses that pile
+    up while the thread is busy are coalesced into a single write per file.
+    Without a root, RAW_DATA_PATH is read on every write so it can be overridden.
+    """
+
+    root: Optional[str] = None
+    _queue: queue.Queue = field(default_factory=queue.Queue, init=False, repr=False)
+    _files: Dict[str, Any] = field(default_factory=dict, init=False, repr=False)
+    _error: Optional[Exception] = field(default=None, init=False, repr=False)
+    _thread: Optional[threading.Thread] = field(default=None, init=False, repr=False)
+    _thread_lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False
+    )
+
+    def write(self, data, channel_id, resource):
+        if self._thread is None:
+            # The drain thread is only started once there is something to write
+            with self._thread_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._drain, daemon=True)
+                    self._thread.start()
+                    # Callers of the get_* functions may never flush, and a daemon
+                    # thread's open files are not flushed when the interpreter exits
+                    atexit.register(self.flush)
+        root = self.root or RAW_DATA_PATH
+        self._queue.put((data, f"{root}/{channel_id}", resource))
+
+    def flush(self):
+        """
+        Blocks until all queued responses are written and closes the NDJSON files,
+        re-raising the first write error, if any.
+        """
+        self._queue.join()
+        for file in self._files.values():
+            file.close()
+        self._files.clear()
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def _drain(self):
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            # Group everything queued so far into one write per file
+            lines = {}
+            try:
+                for data, channel_dir, resource in batch:
+                    lines.setdefault((channel_dir, resource), []).append(
+                        json.dumps(data)
+                    )
+                for (channel_dir, resource), chunk in lines.items():
+                    self._file(channel_dir, resource).write("\n".join(chunk) + "\n")
+            except Exception as error:
+                self._error = self._error or error
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _file(self, channel_dir, resource):
+        path = f"{channel_dir}/{resource}.ndjson"
+        file = self._files.get(path)
+        if file is None:
+            _ensure_dir(channel_dir)
+            file = self._files[path] = open(path, "a", buffering=1 << 20)
+        return file
+
+
+_dump_writer = DumpWriter()
+
+
+def flush_dumps():
+    """
+    Blocks until all background dumps are written and closes the NDJSON files,
+    re-raising any write error. Call it after using the get_* functions with
+    dump_file=True directly; retrieve_full_channel_data does so itself.
+    """
+    _dump_writer.flush()
+
+
+def get_channel_info(api_service, channel_id, dump_file=False, parts=CHANNEL_PARTS):
+    part = ",".join(parts)
+    channel_info = _cached_execute(
+        api_service.channels().list(id=channel_id, part=part),
+        "channels",
+        channel_id,
+        part,
     )
     if dump_file:
-        path = f"{RAW_DATA_PATH}/{channel_id}/channel_info/"
-        Path(path).mkdir(parents=True, exist_ok=True)
-        json.dump(channel_info, open(f"{path}/{channel_id}_channel_info.json", "w"))
+        _dump_writer.write(channel_info, channel_id, "channel_info")
     return channel_info
 
 
@@ -45,51 +299,77 @@ def get_channel_videos(
 ):
     videos = []
     next_page_token = None
-    page = 0
     n_videos = 0
     while True:
-        response = (
-            api_service.playlistItems()
-            .list(
+        response = _cached_execute(
+            api_service.playlistItems().list(
                 playlistId=playlist_id,
                 part="contentDetails,snippet",
                 maxResults=50,
                 pageToken=next_page_token,
-            )
-            .execute()
+            ),
+            "playlistItems",
+            f"{playlist_id}|{next_page_token}",
+            "contentDetails,snippet",
         )
         if dump_file:
-            path = f"{RAW_DATA_PATH}/{channel_id}/videos/"
-            Path(path).mkdir(parents=True, exist_ok=True)
-            json.dump(response, open(f"{path}/{playlist_id}_video_{page}.json", "w"))
+            _dump_writer.write(response, channel_id, "videos")
         videos.extend(response["items"])
         next_page_token = response.get("nextPageToken")
         n_videos += 50
-        page += 1
         if next_page_token is None or n_videos >= max_videos:
             break
     return videos
 
 
-def get_video_data(api_service, video_id, channel_id, dump_file=False):
-    video_data = (
-        api_service.videos()
-        .list(id=video_id, part="contentDetails,snippet,statistics,status,topicDetails")
-        .execute()
+def get_video_data(
+    api_service, video_id, channel_id, dump_file=False, parts=VIDEO_PARTS
+):
+    part = ",".join(parts)
+    video_data = _cached_execute(
+        api_service.videos().list(id=video_id, part=part), "videos", video_id, part
     )
     if dump_file:
-        path = f"{RAW_DATA_PATH}/{channel_id}/video_data/"
-        Path(path).mkdir(parents=True, exist_ok=True)
-        json.dump(video_data, open(f"{path}/{video_id}_data.json", "w"))
+        _dump_writer.write(video_data, channel_id, "video_data")
     return video_data
 
 
+def get_video_data_batch(
+    api_service, video_ids, channel_id, dump_file=False, parts=VIDEO_PARTS
+):
+    """
+    Retrieves the data of several videos, requesting up to 50 IDs per API call.
+
+    Args:
+        video_ids: A list of video IDs.
+        channel_id: The channel the videos belong to, used for the dump path.
+        parts: The resource parts to request.
+
+    Returns:
+        A list of video response items. Videos that no longer exist are missing.
+    """
+    part = ",".join(parts)
+    items = []
+    for chunk in _chunked(video_ids, VIDEOS_PER_REQUEST):
+        ids = ",".join(chunk)
+        video_data = _cached_execute(
+            api_service.videos().list(id=ids, part=part), "videos", ids, part
+        )
+        if dump_file:
+            _dump_writer.write(video_data, channel_id, "video_data")
+        items.extend(video_data["items"])
+    return items
+
+
 def get_video_stats(api_service, video_id, channel_id, dump_file=False):
-    video_stats = api_service.videos().list(id=video_id, part="statistics").execute()
+    video_stats = _cached_execute(
+        api_service.videos().list(id=video_id, part="statistics"),
+        "videos",
+        video_id,
+        "statistics",
+    )
     if dump_file:
-        path = f"{RAW_DATA_PATH}/{channel_id}/video_stats/"
-        Path(path).mkdir(parents=True, exist_ok=True)
-        json.dump(video_stats, open(f"{path}/{video_id}_stats.json", "w"))
+        _dump_writer.write(video_stats, channel_id, "video_stats")
     return video_stats
 
 
@@ -98,33 +378,68 @@ def get_video_comments(
 ):
     comments = []
     next_page_token = None
-    page = 0
     n_comments = 0
     while True:
-        response = (
-            api_service.commentThreads()
-            .list(
+        response = _execute(
+            api_service.commentThreads().list(
                 videoId=video_id,
                 part="snippet",
                 maxResults=100,
                 textFormat="plainText",
                 pageToken=next_page_token,
             )
-            .execute()
         )
         if dump_file:
-            path = f"{RAW_DATA_PATH}/{channel_id}/comments/"
-            Path(path).mkdir(parents=True, exist_ok=True)
-            json.dump(response, open(f"{path}/{video_id}_comments_{page}.json", "w"))
+            _dump_writer.write(response, channel_id, "comments")
         comments.extend(response["items"])
         next_page_token = response.get("nextPageToken")
         n_comments += 100
-        page += 1
         if next_page_token is None or n_comments >= max_comments:
             break
     return comments
 
 
+def _retrieve_video_comments(
+    api_service, video_item, channel_id, max_comments, dump_file
+):
+    """
+    Retrieves the comments of a single video. Runs in a worker thread.
+
+    Returns:
+        A list of comment rows.
+    """
+    video_id = video_item["id"]
+    comment_rows = []
+    statistics = video_item.get("statistics") or {}
+    if max_comments > 0 and int(statistics.get("commentCount", 0)) > 0:
+        comments = get_video_comments(
+            api_service,
+            video_id,
+            channel_id=channel_id,
+            max_comments=max_comments,
+            dump_file=dump_file,
+        )
+        for comment in comments:
+            filtered_comment_info = filter_comment_info(comment)
+            filtered_comment_info.extend([video_id, channel_id])
+            comment_rows.append(filtered_comment_info)
+    else:
+        comment_rows.append(["comments disabled"] + [None] * 7 + [video_id, channel_id])
+    return comment_rows
+
+
+def _write_comments_parquet(writer, comment_columns):
+    """
+    Writes the buffered comment columns as one row group and empties the buffer.
+    """
+    if comment_columns["id"]:
+        writer.write_batch(
+            pa.RecordBatch.from_pydict(comment_columns, schema=COMMENT_SCHEMA)
+        )
+        for values in comment_columns.values():
+            values.clear()
+
+
 # channel_id1,channel_id2,...
 def retrieve_full_channel_data(
     api_service,
@@ -133,58 +448,102 @@ def retrieve_full_channel_data(
     max_comments=10000,
     video_date_range=None,
     dump_file=False,
+    max_workers=20,
+    comments_parquet_dir=None,
+    channel_parts=CHANNEL_PARTS,
+    video_parts=VIDEO_PARTS,
 ):
+    """
+    Retrieves channel info, video data and comments for the given channels.
+
+    Args:
+        channel_parts: The channel parts to request. contentDetails is always added,
+            since it holds the uploads playlist.
+        video_parts: The video parts to request. statistics is added when comments
+            are retrieved, since it holds the comment count.
+        comments_parquet_dir: If set, each channel's comments are streamed to
+            "<comments_parquet_dir>/<channel_id>_comments.parquet" instead of being
+            kept in memory, and the returned comments dataset stays empty.
+    """
     channels_dataset = []
     videos_dataset = []
-    comments_dataset = []
+    # Comments are accumulated column by column, see create_comments_df
+    comments_dataset = {column: [] for column in COMMENT_COLUMNS}
     # Retrieving the channels
-    channel_info = get_channel_info(api_service, channel_ids, dump_file=dump_file)
-    for channel in channel_info["items"]:
-        channel_id = channel["id"]
-        print(channel_id)
-        # Filtering the response to get the relevant info
-        channels_dataset.append(filter_channel_info(channel))
-        # Retrieving the videos. We need the playlist id first!
-        playlist_id = channel["contentDetails"]["relatedPlaylists"]["uploads"]
-        videos = get_channel_videos(
-            api_service,
-            playlist_id,
-            channel_id=channel_id,
-            max_videos=max_videos,
-            dump_file=dump_file,
-        )
-        # Retrieving video stats + comments
-        for video in videos:
-            video_id = video["contentDetails"]["videoId"]
-            # print(f"video_id: {video_id}")
-            video_published_date = video["snippet"]["publishedAt"]
-            if not video_date_range or _is_within_date_range(
-                video_published_date, video_date_range
-            ):
-                video_data = get_video_data(
-                    api_service, video_id, channel_id=channel_id, dump_file=dump_file
+    if "contentDetails" not in channel_parts:
+        channel_parts = ("contentDetails", *channel_parts)
+    if max_comments > 0 and "statistics" not in video_parts:
+        video_parts = ("statistics", *video_parts)
+    channel_info = get_channel_info(
+        api_service, channel_ids, dump_file=dump_file, parts=channel_parts
+    )
+    try:
+        # Comments are fetched concurrently; max_workers bounds the requests in flight
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for channel in channel_info["items"]:
+                channel_id = channel["id"]
+                print(channel_id)
+                # Filtering the response to get the relevant info
+                channels_dataset.append(filter_channel_info(channel))
+                # Retrieving the videos. We need the playlist id first!
+                playlist_id = channel["contentDetails"]["relatedPlaylists"]["uploads"]
+                videos = get_channel_videos(
+                    api_service,
+                    playlist_id,
+                    channel_id=channel_id,
+                    max_videos=max_videos,
+                    dump_file=dump_file,
                 )
-                videos_dataset.append(filter_video_info(video_data["items"][0]))
-                if max_comments > 0 and (
-                    "commentCount" in video_data["items"][0].get("statistics")
-                    and int(
-                        video_data["items"][0].get("statistics").get("commentCount")
+                video_ids = [
+                    video["contentDetails"]["videoId"]
+                    for video in videos
+                    if not video_date_range
+                    or _is_within_date_range(
+                        video["snippet"]["publishedAt"], video_date_range
                     )
-                    > 0
-                ):
-                    comments = get_video_comments(
-                        api_service,
-                        video_id,
-                        channel_id=channel_id,
-                        max_comments=max_comments,
-                        dump_file=dump_file,
+                ]
+                # Retrieving video stats in batches of 50, then comments per video
+                video_items = get_video_data_batch(
+                    api_service,
+                    video_ids,
+                    channel_id=channel_id,
+                    dump_file=dump_file,
+                    parts=video_parts,
+                )
+                videos_dataset.extend(filter_video_info(item) for item in video_items)
+                retrieve_comments = partial(
+                    _retrieve_video_comments,
+                    api_service,
+                    channel_id=channel_id,
+                    max_comments=max_comments,
+                    dump_file=dump_file,
+                )
+                comments_buffer = comments_dataset
+                writer = None
+                if comments_parquet_dir:
+                    _ensure_dir(comments_parquet_dir)
+                    comments_buffer = {column: [] for column in COMMENT_COLUMNS}
+                    writer = pq.ParquetWriter(
+                        f"{comments_parquet_dir}/{channel_id}_comments.parquet",
+                        COMMENT_SCHEMA,
+                        compression="zstd",
                     )
-                    for comment in comments:
-                        filtered_comment_info = filter_comment_info(comment)
-                        filtered_comment_info.extend([video_id, channel_id])
-                        comments_dataset.append(filtered_comment_info)
-                else:
-                    comments_dataset.append(["comments disabled", video_id, channel_id])
+                try:
+                    # map keeps the playlist order
+                    for comment_rows in executor.map(retrieve_comments, video_items):
+                        for column, values in zip(COMMENT_COLUMNS, zip(*comment_rows)):
+                            comments_buffer[column].extend(values)
+                        if (
+                            writer
+                            and len(comments_buffer["id"]) >= PARQUET_ROW_GROUP_SIZE
+                        ):
+                            _write_comments_parquet(writer, comments_buffer)
+                finally:
+                    if writer:
+                        _write_comments_parquet(writer, comments_buffer)
+                        writer.close()
+    finally:
+        flush_dumps()
     return (channels_dataset, videos_dataset, comments_dataset)
 
 
@@ -202,16 +561,16 @@ def retrieve_channel_id(
         The channel ID, or "None" if no channel was found.
     """
     channel_id = "None"
-    response = (
-        api_service.channels().list(part="id", forUsername=media_author_name).execute()
+    response = _execute(
+        api_service.channels().list(part="id", forUsername=media_author_name)
     )
     if response.get("items"):
         channel_id = response["items"][0]["id"]
     else:
-        response = (
-            api_service.search()
-            .list(part="snippet", q=media_author_url, type="video", maxResults=1)
-            .execute()
+        response = _execute(
+            api_service.search().list(
+                part="snippet", q=media_author_url, type="video", maxResults=1
+            )
         )
         if response.get("items"):
             channel_title = response["items"][0]["snippet"]["channelTitle"]
@@ -224,137 +583,127 @@ def retrieve_channel_id(
     return channel_id
 
 
+def retrieve_channel_ids_batch(
+    api_service, media_authors: List[Tuple[str, str]], max_workers: int = 20
+) -> Dict[str, str]:
+    """
+    Resolves the channel IDs of many Reddit media authors, looking each name up only once.
+
+    Args:
+        media_authors: (media_author_name, media_author_url) pairs, e.g. one per thread.
+        max_workers: How many lookups run concurrently.
+
+    Returns:
+        A dict mapping each media author name to its channel ID, as returned by
+        retrieve_channel_id. The first URL seen for a name is used for the search fallback.
+    """
+    author_urls = {}
+    for media_author_name, media_author_url in media_authors:
+        author_urls.setdefault(media_author_name, media_author_url)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        channel_ids = executor.map(
+            partial(retrieve_channel_id, api_service),
+            author_urls.keys(),
+            author_urls.values(),
+        )
+        return dict(zip(author_urls, channel_ids))
+
+
 def filter_channel_info(response_item):
+    # Parts that weren't requested are missing from the response
+    snippet = response_item.get("snippet") or {}
+    statistics = response_item.get("statistics") or {}
     return {
         "id": response_item.get("id"),
-        "title": response_item.get("snippet").get("title"),
-        "description": response_item.get("snippet").get("description"),
-        "country": response_item.get("snippet").get("country"),
-        "published_at": response_item.get("snippet").get("publishedAt"),
-        "view_count": response_item.get("statistics").get("viewCount"),
-        "sub_count": response_item.get("statistics").get("subscriberCount"),
-        "video_count": response_item.get("statistics").get("videoCount"),
-        "topic_categories": ",".join(
-            response_item.get("topicDetails").get("topicCategories")
-        )
-        if response_item.get("topicDetails")
-        else None,
-        "made_for_kids": response_item.get("status").get("madeForKids"),
-        "keywords": response_item.get("brandingSettings")
-        .get("channel")
-        .get("keywords"),
+        "title": snippet.get("title"),
+        "description": snippet.get("description"),
+        "country": snippet.get("country"),
+        "published_at": snippet.get("publishedAt"),
+        "view_count": statistics.get("viewCount"),
+        "sub_count": statistics.get("subscriberCount"),
+        "video_count": statistics.get("videoCount"),
+        "topic_categories": (response_item.get("topicDetails") or {}).get(
+            "topicCategories"
+        ),
+        "made_for_kids": (response_item.get("status") or {}).get("madeForKids"),
+        "keywords": (
+            (response_item.get("brandingSettings") or {}).get("channel") or {}
+        ).get("keywords"),
     }
 
 
 def filter_video_info(video_response_item):
+    # Parts that weren't requested are missing from the response
+    snippet = video_response_item.get("snippet") or {}
+    statistics = video_response_item.get("statistics") or {}
     return {
         "video_id": video_response_item.get("id"),
-        "title": video_response_item.get("snippet").get("title"),
-        "description": video_response_item.get("snippet").get("description"),
-        "tags": ",".join(video_response_item.get("snippet").get("tags"))
-        if video_response_item.get("snippet").get("tags")
-        else None,
-        "category_id": video_response_item.get("snippet").get("categoryId"),
-        "published_at": video_response_item.get("snippet").get("publishedAt"),
-        "duration": video_response_item.get("contentDetails").get("duration"),
-        "made_for_kids": video_response_item.get("status").get("madeForKids"),
-        "channel": video_response_item.get("snippet").get("channelTitle"),
-        "view_count": video_response_item.get("statistics").get("viewCount"),
-        "like_count": video_response_item.get("statistics").get("likeCount"),
-        "dislike_count": video_response_item.get("statistics").get("dislikeCount"),
-        "favourite_count": video_response_item.get("statistics").get("favoriteCount"),
-        "comment_count": video_response_item.get("statistics").get("commentCount"),
-        "topic_categories": ",".join(
-            video_response_item.get("topicDetails").get("topicCategories")
-        )
-        if video_response_item.get("topicDetails")
-        else None,
+        "title": snippet.get("title"),
+        "description": snippet.get("description"),
+        "tags": snippet.get("tags"),
+        "category_id": snippet.get("categoryId"),
+        "published_at": snippet.get("publishedAt"),
+        "duration": (video_response_item.get("contentDetails") or {}).get("duration"),
+        "made_for_kids": (video_response_item.get("status") or {}).get("madeForKids"),
+        "channel": snippet.get("channelTitle"),
+        "view_count": statistics.get("viewCount"),
+        "like_count": statistics.get("likeCount"),
+        "favourite_count": statistics.get("favoriteCount"),
+        "comment_count": statistics.get("commentCount"),
+        "topic_categories": (video_response_item.get("topicDetails") or {}).get(
+            "topicCategories"
+        ),
     }
 
 
 def filter_comment_info(comment_response_item):
-    id = comment_response_item.get("id")
-    text = (
-        comment_response_item.get("snippet")
-        .get("topLevelComment")
-        .get("snippet")
-        .get("textOriginal")
-    )
-    author_name = (
-        comment_response_item.get("snippet")
-        .get("topLevelComment")
-        .get("snippet")
-        .get("authorDisplayName")
-    )
-    author_id = (
-        (
-            comment_response_item.get("snippet")
-            .get("topLevelComment")
-            .get("snippet")
-            .get("authorChannelId")
-            .get("value")
-        )
-        if "authorChannelId"
-        in comment_response_item.get("snippet").get("topLevelComment").get("snippet")
-        else ""
-    )
-    like_count = (
-        comment_response_item.get("snippet")
-        .get("topLevelComment")
-        .get("snippet")
-        .get("likeCount")
-    )
-    published_at = (
-        comment_response_item.get("snippet")
-        .get("topLevelComment")
-        .get("snippet")
-        .get("publishedAt")
-    )
-    updated_at = (
-        comment_response_item.get("snippet")
-        .get("topLevelComment")
-        .get("snippet")
-        .get("updatedAt")
-    )
-    reply_count = comment_response_item.get("snippet").get("totalReplyCount")
+    snippet = comment_response_item["snippet"]
+    # Resolve the top-level comment snippet once instead of per field
+    top_level_snippet = snippet["topLevelComment"]["snippet"]
     return [
-        id,
-        text,
-        author_name,
-        author_id,
-        like_count,
-        published_at,
-        updated_at,
-        reply_count,
+        comment_response_item.get("id"),
+        top_level_snippet.get("textOriginal"),
+        top_level_snippet.get("authorDisplayName"),
+        top_level_snippet.get("authorChannelId", {}).get("value", ""),
+        top_level_snippet.get("likeCount"),
+        top_level_snippet.get("publishedAt"),
+        top_level_snippet.get("updatedAt"),
+        snippet.get("totalReplyCount"),
     ]
 
 
 def create_channels_df(channels_dataset):
-    return pd.DataFrame(channels_dataset)
+    # topic_categories stays a list column, ready for DataFrame.explode
+    return pa.Table.from_pylist(channels_dataset, schema=CHANNEL_SCHEMA).to_pandas()
 
 
 def create_videos_df(videos_dataset):
-    return pd.DataFrame(videos_dataset)
+    # tags and topic_categories stay list columns, ready for DataFrame.explode
+    return pa.Table.from_pylist(videos_dataset, schema=VIDEO_SCHEMA).to_pandas()
 
 
 def create_comments_df(comments_dataset):
+    """
+    Builds the comments DataFrame from a dict of per-column lists.
+
+    Args:
+        comments_dataset: A dict mapping each of COMMENT_COLUMNS to a list of values.
+
+    Returns:
+        A DataFrame with nullable integer like_count and reply_count columns.
+    """
     return pd.DataFrame(
-        comments_dataset,
-        columns=[
-            "id",
-            "text",
-            "author_name",
-            "author_id",
-            "like_count",
-            "published_at",
-            "updated_at",
-            "reply_count",
-            "video_id",
-            "channel_id",
-        ],
+        {
+            column: pd.array(
+                comments_dataset[column], dtype=COMMENT_DTYPES.get(column, object)
+            )
+            for column in COMMENT_COLUMNS
+        }
     )
 
 
+# The same range is checked against every video, so parse it only once
+@lru_cache(maxsize=8)
 def _parse_date_range(date_range: str) -> Tuple[datetime.date, datetime.date]:
     """
     Parses a date range string into a tuple of datetime.date objects.
@@ -384,6 +733,6 @@ def _is_within_date_range(date: str, date_range: str) -> bool:
         True if the date is within the date range, False otherwise.
     """
     start_date, end_date = _parse_date_range(date_range)
-    return (
-        start_date <= datetime.strptime(date, "%Y-%m-%dT%H:%M:%SZ").date() <= end_date
-    )
+    # fromisoformat only accepts the "Z" suffix from Python 3.11 on
+    published_at = datetime.fromisoformat(date.replace("Z", "+00:00"))
+    return start_date <= published_at.date() <= end_date
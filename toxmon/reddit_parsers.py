@@ -2,7 +2,37 @@ import ast
 import re
 from collections import Counter
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import orjson
+import pandas as pd
+
+# Flattened thread JSON columns kept by parse_threads_bulk, mapped to the names
+# parse_thread uses
+BULK_THREAD_COLUMNS = {
+    "name": "thread_name",
+    "subreddit_name_prefixed": "subreddit_name",
+    "subreddit_id": "subreddit_id",
+    "title": "title",
+    "author_name": "author_name",
+    "num_comments": "num_comments",
+    "ups": "ups",
+    "upvote_ratio": "upvote_ratio",
+    "score": "score",
+    "selftext": "selftext",
+    "media": "media",
+    "media_only": "media_only",
+    "created_utc": "created_utc",
+}
+# Defaults parse_thread uses for missing fields, every other missing field is None
+BULK_THREAD_DEFAULTS = {
+    "num_comments": 0,
+    "ups": 0,
+    "upvote_ratio": 0.0,
+    "score": 0,
+    "media_only": False,
+    "created_utc": 0.0,  # Reddit sends created_utc as a float
+}
 
 
 @dataclass
@@ -13,6 +43,9 @@ class RedditParser:
         ),
         init=False,
     )
+    video_id_pattern: re.Pattern = field(
+        default=re.compile(r"youtube\.com/embed/([^/?]+)"), init=False
+    )
 
     def parse_thread(self, thread_json: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -22,18 +55,16 @@ class RedditParser:
         subreddit_name: Optional[str] = thread_json.get("subreddit_name_prefixed", None)
         subreddit_id: Optional[str] = thread_json.get("subreddit", {}).get("id", None)
         title: Optional[str] = thread_json.get("title", None)
+        author = thread_json.get("author")
         author_name: Optional[str] = (
-            thread_json.get("author", {}).get("name", None)
-            if thread_json.get("author") != "None"
-            else None
+            author.get("name", None) if isinstance(author, dict) else None
         )
         num_comments: int = thread_json.get("num_comments", 0)
         ups: int = thread_json.get("ups", 0)
-        downs: int = thread_json.get("downs", 0)
         upvote_ratio: float = thread_json.get("upvote_ratio", 0.0)
         score: int = thread_json.get("score", 0)
         selftext: Optional[str] = thread_json.get("selftext", None)
-        media: Optional[str] = thread_json.get("media", None)
+        media: Optional[Union[str, Dict[str, Any]]] = thread_json.get("media", None)
         media_only: bool = thread_json.get("media_only", False)
         created_utc: int = thread_json.get("created_utc", 0)
 
@@ -45,7 +76,6 @@ class RedditParser:
             "author_name": author_name,
             "num_comments": num_comments,
             "ups": ups,
-            "downs": downs,
             "upvote_ratio": upvote_ratio,
             "score": score,
             "selftext": selftext,
@@ -61,6 +91,35 @@ class RedditParser:
 
         return thread_dict
 
+    def parse_threads_bulk(self, json_lines: Iterable[bytes]) -> pd.DataFrame:
+        """
+        Parses many raw thread JSON documents at once into a DataFrame with the same columns and defaults as parse_thread.
+        """
+        records = [orjson.loads(line) for line in json_lines]
+        # max_level=1 turns author.name and subreddit.id into author_name and subreddit_id
+        df = (
+            pd.json_normalize(records, sep="_", max_level=1)
+            .reindex(columns=list(BULK_THREAD_COLUMNS))
+            .rename(columns=BULK_THREAD_COLUMNS)
+        )
+        for column in df.columns:
+            if column in BULK_THREAD_DEFAULTS:
+                default = BULK_THREAD_DEFAULTS[column]
+                df[column] = df[column].fillna(default).astype(type(default))
+            else:
+                # object dtype keeps None instead of NaN, even for all-missing columns
+                df[column] = df[column].astype(object).where(df[column].notna(), None)
+        # media is kept whole rather than flattened, like in parse_thread
+        df["media"] = [record.get("media") for record in records]
+        df["urls"] = df["selftext"].fillna("").str.findall(self.url_pattern)
+        yt_data = [
+            self.extract_youtube_media({"media": media}) for media in df["media"]
+        ]
+        yt_df = pd.DataFrame(
+            [data if data != "None" else {} for data in yt_data], index=df.index
+        )
+        return df.join(yt_df)
+
     def parse_comment(self, comment_json: Dict[str, Any]) -> Dict[str, Any]:
         """
         Extracts essential information from the comment JSON and returns a Pandas DataFrame.
@@ -71,42 +130,61 @@ class RedditParser:
         self, comment: Dict[str, Any], parent_id: str = None
     ) -> List[Dict[str, Any]]:
         """
-        Recursively parses the comment tree to extract information from both top-level comments and nested replies.
-        """
-        comment_data = [
-            {
-                "id": comment.get("id", None),
-                "body": comment.get("body", None),
-                "author_name": comment.get("author", None),
-                "created_utc": comment.get("created_utc", None),
-                "score": comment.get("score", 0),
-                "is_submitter": comment.get("is_submitter", False),
-                "parent_id": parent_id,
-                "link_id": comment.get("link_id", None),
-                "permalink": comment.get("permalink", None),
-                "controversiality": comment.get("controversiality", 0),
-                "gilded": comment.get("gilded", 0),
-            }
-        ]
-
-        replies = comment.get("replies", [])
-        for reply in replies:
-            comment_data.extend(
-                self._parse_comment_tree(reply, parent_id=comment.get("id"))
+        Walks the comment tree depth-first with an explicit stack to extract information from both top-level comments and nested replies.
+        parent_id is always the bare id of the parent comment, as in the id column, and None for top-level comments.
+        """
+        comment_data = []
+        stack = [(comment, parent_id)]
+        while stack:
+            current, current_parent_id = stack.pop()
+            comment_data.append(
+                {
+                    "id": current.get("id", None),
+                    "body": current.get("body", None),
+                    "author_name": current.get("author", None),
+                    "created_utc": current.get("created_utc", None),
+                    "score": current.get("score", 0),
+                    "is_submitter": current.get("is_submitter", False),
+                    "parent_id": current_parent_id
+                    or self._parent_comment_id(current.get("parent_id")),
+                    "link_id": current.get("link_id", None),
+                    "permalink": current.get("permalink", None),
+                    "controversiality": current.get("controversiality", 0),
+                    "gilded": current.get("gilded", 0),
+                }
             )
+            # Pushed in reverse so replies come out in their original order
+            current_id = current.get("id")
+            for reply in reversed(current.get("replies", [])):
+                stack.append((reply, current_id))
 
         return comment_data
 
+    @staticmethod
+    def _parent_comment_id(parent_fullname: Optional[str]) -> Optional[str]:
+        """
+        Turns a raw parent fullname into a bare comment id, e.g. for flat streamed comments.
+        Top-level comments point at the submission ("t3_..."), which yields None.
+        """
+        if parent_fullname and parent_fullname.startswith("t1_"):
+            return parent_fullname[3:]
+        return None
+
     def extract_youtube_media(self, parsed_thread: Dict[str, Any]) -> Dict[str, Any]:
         """
         Extracts YouTube media information from the provided data.
         """
         media_str = parsed_thread.get("media")
-        if media_str == "None":
+        if media_str is None or media_str == "None":
             return "None"
         else:
             try:
-                media_dict = ast.literal_eval(media_str)
+                # Newer dumps store media as a JSON object, older ones as a Python repr
+                media_dict = (
+                    media_str
+                    if isinstance(media_str, dict)
+                    else self._parse_media_str(media_str)
+                )
                 if "type" in media_dict and media_dict["type"] == "youtube.com":
                     youtube_data = {
                         "media_author_name": media_dict["oembed"].get(
@@ -125,16 +203,33 @@ class RedditParser:
                 print(f"Error parsing media: {media_str}")
         return "None"
 
+    def _parse_media_str(self, media_str: str) -> Dict[str, Any]:
+        """
+        Parses a media string, trying the fast JSON parser before the Python literal parser.
+        """
+        try:
+            return orjson.loads(media_str)
+        except orjson.JSONDecodeError:
+            # Legacy dumps hold str(dict), which is not JSON. Rewriting quotes and
+            # None/True/False into JSON corrupts titles containing them, so these
+            # still go through ast.
+            return ast.literal_eval(media_str)
+
     def extract_urls_from_selftext(self, parsed_data: Dict[str, Any]) -> List[str]:
         """
         Extracts URLs from the 'selftext' field of the provided data.
         """
-        urls = self.url_pattern.findall(parsed_data.get("selftext"))
+        selftext = parsed_data.get("selftext")
+        # Most selftexts have no links at all; a substring check is far cheaper
+        # than running the backtracking URL pattern over them
+        if not selftext or "http" not in selftext:
+            return []
+        urls = self.url_pattern.findall(selftext)
         return urls
 
     def _extract_video_id(self, html: str) -> str:
         """
         Extracts the YouTube video ID from the embed HTML.
         """
-        video_id_match = re.search(r"youtube\.com/embed/([^/?]+)", html)
+        video_id_match = self.video_id_pattern.search(html)
         return video_id_match.group(1) if video_id_match else "None"